@@ -1,9 +1,14 @@
+import io
 import math
+import time
 import numpy as np
 import pandas as pd
+import requests
 import streamlit as st
 import streamlit.components.v1 as components
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 st.set_page_config(
     page_title="Tenant Matching — Co-living Compatibility Engine",
@@ -202,6 +207,8 @@ FEATURE_LABELS = {
     "shared_spaces_usage": ("🍳 Shared spaces",   "1 = stays in room · 5 = common areas"),
 }
 
+MAX_TOP_N = 15  # upper bound of the sidebar "Top N" slider
+
 TEAL = "#14b8a6"
 TEAL_LIGHT = "#99f6e4"
 GREY_SEG = "#e2e8f0"
@@ -209,34 +216,52 @@ GREY_MATCH = "#94a3b8"
 GREY_MATCH_EMPTY = "#f1f5f9"
 
 
-def clamp01(x): return float(max(0.0, min(1.0, x)))
-def sim(a, b):  return clamp01(1.0 - abs(a-b)/4.0)
-def comp(a, b): return clamp01(1.0 - abs(a+b-6)/4.0)
+# sim/comp work element-wise on scalars or arrays
+def sim(a, b):  return np.clip(1.0 - np.abs(a-b)/4.0, 0.0, 1.0)
+def comp(a, b): return np.clip(1.0 - np.abs(a+b-6)/4.0, 0.0, 1.0)
+
+IS_COMP = np.array([SCORING_MODE.get(f) == "complementarity" for f in FEATURES])
+MODES = ["complementarity" if c else "similarity" for c in IS_COMP]
 
-def feature_score(f, a, b):
-    if SCORING_MODE.get(f) == "complementarity":
-        return comp(a, b), "complementarity"
-    return sim(a, b), "similarity"
+def feature_scores(user_vals, X):
+    """Per-feature scores of user_vals against every row of X (n x 10 feature matrix), in one pass."""
+    u = np.array([float(user_vals[f]) for f in FEATURES])
+    return np.where(IS_COMP, comp(u, X), sim(u, X))
 
 def prettify(f): return f.replace("_"," ").capitalize()
+PRETTY = {f: prettify(f) for f in FEATURES}
 
 def _run(user_vals, df, exclude_id=None, top_n=5):
     tw = sum(WEIGHTS.get(f,1.0) for f in FEATURES)
+    w = [float(WEIGHTS.get(f,1.0)) for f in FEATURES]
+    X = df[FEATURES].to_numpy(dtype=float)
+    ids = df["user_id"].to_numpy()
+    labels = df["tenant_label"].to_numpy()
+    S = feature_scores(user_vals, X)
+
+    # pass 1: scores for all rows at once, accumulated in FEATURES order like the scalar formula
+    ws = np.zeros(len(X))
+    for k in range(len(FEATURES)):
+        ws += w[k] * S[:, k]
+    score = np.round(ws/tw*100, 2)  # rank on the displayed value so equal scores keep profile order
+    if exclude_id is not None:
+        score[ids == exclude_id] = -np.inf
+    # partial selection (like matching_engine.top_n_indices): partition for the top_n-th best score,
+    # then stable-sort only the candidates at or above it
+    cand = np.arange(len(score))
+    if 0 < top_n < len(score):
+        kth = np.partition(score, len(score)-top_n)[len(score)-top_n]
+        cand = np.flatnonzero(score >= kth)
+    top = [i for i in cand[np.argsort(-score[cand], kind="stable")][:max(top_n, 0)] if score[i] > -np.inf]
+
+    # pass 2: drivers / details for the kept matches only
     results = []
-    for _, row in df.iterrows():
-        if exclude_id is not None and row["user_id"] == exclude_id:
-            continue
-        ws, details = 0.0, []
-        for f in FEATURES:
-            sc, mode = feature_score(f, float(user_vals[f]), float(row[f]))
-            w = float(WEIGHTS.get(f,1.0))
-            ws += w * sc
-            details.append((f, sc, w, mode))
+    for i in top:
+        details = [(f, float(S[i, k]), w[k], MODES[k]) for k, f in enumerate(FEATURES)]
         details.sort(key=lambda x: x[1]*x[2], reverse=True)
-        results.append({"label":row["tenant_label"], "score":round(ws/tw*100,2),
+        results.append({"label":labels[i], "score":float(score[i]),
                         "top3":details[:3], "all_details":details})
-    results.sort(key=lambda x: x["score"], reverse=True)
-    return results[:top_n]
+    return results
 
 def match_from_profile(row, df, top_n=5):
     return _run({f:float(row[f]) for f in FEATURES}, df, exclude_id=row["user_id"], top_n=top_n)
@@ -248,16 +273,73 @@ def match_from_user(vals, df, top_n=5):
 # ============================================================
 # HTML HELPERS — always return strings; st.markdown called from outside
 # ============================================================
-def avatar_url(label, size=128):
+@lru_cache(maxsize=4096)
+def avatar_url(label, size=144):
     seed = urllib.parse.quote(label)
     return f"https://api.dicebear.com/9.x/notionists/png?seed={seed}&size={size}&backgroundColor=f0fdfa"
 
+AVATAR_TTL_S = 600  # stored downloads, including failures, are retried after this many seconds
+
+@st.cache_resource
+def _avatar_store():
+    """Process-wide {(label, size): (bytes or None, fetched_at)} shared by avatar_image and prefetch_avatars."""
+    return {}
+
+def _fresh(entry):
+    return entry is not None and time.monotonic() - entry[1] < AVATAR_TTL_S
+
+def _download_avatar(label, size, session=requests):
+    try:
+        resp = session.get(avatar_url(label, size), timeout=3)
+        resp.raise_for_status()
+        return resp.content
+    except requests.RequestException:
+        return None
+
+def fetch_avatar_bytes(label, size=144):
+    """
+    Avatar bytes for (label, size), downloaded on a store miss and reused by later reruns.
+    None if the download failed — stored too, so an unreachable host costs one timeout per TTL, not per rerun.
+    """
+    store = _avatar_store()
+    entry = store.get((label, size))
+    if not _fresh(entry):
+        entry = store[(label, size)] = (_download_avatar(label, size), time.monotonic())
+    return entry[0]
+
+def avatar_image(label, size=144):
+    """Avatar for st.image: stored bytes, or the plain URL (loaded by the browser) if the download failed."""
+    return fetch_avatar_bytes(label, size) or avatar_url(label, size)
+
+def prefetch_avatars(labels, size=144):
+    """
+    Returns {label: bytes or None} for all labels. Only labels missing from the avatar store are
+    downloaded, in parallel over one keep-alive session; the rest are served from the store.
+    """
+    store = _avatar_store()
+    missing = [l for l in dict.fromkeys(labels) if not _fresh(store.get((l, size)))]
+    if missing:
+        with requests.Session() as session, ThreadPoolExecutor(max_workers=8) as pool:
+            contents = list(pool.map(lambda l: _download_avatar(l, size, session), missing))
+        now = time.monotonic()
+        for label, content in zip(missing, contents):
+            store[(label, size)] = (content, now)
+    return {l: store[(l, size)][0] for l in labels}
+
 def donut_svg(p, size=80, stroke=9):
+    """
+    Donut for a 0-100 score. The colour band comes from the exact score (like radar_info_html);
+    only the arc and label are quantized to the whole percent shown, so cards share cached SVGs.
+    """
     p = max(0.0, min(100.0, float(p)))
+    color = TEAL if p>=80 else "#0d7377" if p>=60 else "#f59e0b" if p>=40 else "#ef4444"
+    return _donut_svg(int(round(p)), color, size, stroke)
+
+@lru_cache(maxsize=404)  # 101 percents x 4 colour bands
+def _donut_svg(p, color, size, stroke):
     r = (size-stroke)/2
     c = 2*math.pi*r
     off = c*(1-p/100.0)
-    color = TEAL if p>=80 else "#0d7377" if p>=60 else "#f59e0b" if p>=40 else "#ef4444"
     return (f'<svg width="{size}" height="{size}" viewBox="0 0 {size} {size}">'
             f'<circle cx="{size/2}" cy="{size/2}" r="{r}" fill="none" stroke="{GREY_SEG}" stroke-width="{stroke}"/>'
             f'<circle cx="{size/2}" cy="{size/2}" r="{r}" fill="none" stroke="{color}" stroke-width="{stroke}"'
@@ -515,6 +597,22 @@ def radar_html(vals_a, vals_b, labels, title_a="Tenant", title_b="Best match", s
     return f'<div style="display:flex;justify-content:center;padding:4px 0;">{svg}</div>'
 
 
+# ============================================================
+# PAGINATION — only one page of match cards is rendered per rerun
+# ============================================================
+CARDS_PER_PAGE = 5
+
+def card_page(n_items, key):
+    """Shows a page picker when there is more than one page; returns (start, stop) of the cards to render."""
+    n_pages = math.ceil(n_items / CARDS_PER_PAGE)
+    if n_pages <= 1:
+        return 0, n_items
+    bounds = [(p*CARDS_PER_PAGE, min((p+1)*CARDS_PER_PAGE, n_items)) for p in range(n_pages)]
+    start, stop = st.radio("Matches", bounds, horizontal=True, key=key,
+                           format_func=lambda b: f"{b[0]+1}–{b[1]}")
+    return start, stop
+
+
 # ============================================================
 # HERO
 # ============================================================
@@ -537,7 +635,7 @@ st.markdown("""
 # ============================================================
 with st.sidebar:
     st.markdown("### ⚙️ Settings")
-    top_n = st.slider("Top N matches to show", min_value=1, max_value=15, value=5, step=1)
+    top_n = st.slider("Top N matches to show", min_value=1, max_value=MAX_TOP_N, value=5, step=1)
     st.divider()
     st.markdown("### 📖 How it works")
     st.markdown("""
@@ -557,6 +655,43 @@ Variables have different **weights** based on friction impact.
 # ============================================================
 # LOAD DATA
 # ============================================================
+FEATURE_DTYPES = {f: "int8" for f in FEATURES}  # 1..5 scores fit in one byte
+
+@st.cache_data(show_spinner=False)
+def load_profiles(path):
+    return pd.read_csv(path, dtype=FEATURE_DTYPES)
+
+@st.cache_data(show_spinner=False)
+def read_uploaded_csv(file_bytes):
+    """
+    Parses an uploaded CSV; cached by file content so reruns don't re-parse it.
+    Feature columns are validated as whole numbers in 1..5 before the int8 cast (which would silently wrap
+    out-of-range values); raises ValueError otherwise.
+    """
+    df = pd.read_csv(io.BytesIO(file_bytes))
+    for f in FEATURES:
+        if f not in df.columns:
+            raise ValueError(f"missing column '{f}'")
+        col = pd.to_numeric(df[f], errors="coerce")
+        if col.isna().any() or not col.between(1, 5).all() or (col % 1 != 0).any():
+            raise ValueError(f"column '{f}' must contain whole-number scores from 1 to 5")
+        df[f] = col
+    return df.astype(FEATURE_DTYPES)
+
+@st.cache_data(show_spinner=False)
+def index_by_label(df):
+    """Profiles indexed by tenant_label (first row wins on duplicates) for hash lookups instead of column scans."""
+    return df.drop_duplicates("tenant_label").set_index("tenant_label", drop=False)
+
+@st.cache_data(show_spinner=False)
+def matches_for(tenant, df):
+    """
+    Cached best MAX_TOP_N matches for one tenant, best first.
+    Callers slice [:top_n], so moving the Top N slider never re-scores.
+    """
+    row = index_by_label(df).loc[tenant]
+    return match_from_profile(row, df, top_n=MAX_TOP_N)
+
 try:
     if use_upload:
         up_p = st.sidebar.file_uploader("synthetic_profiles_v2.csv", type=["csv"])
@@ -564,13 +699,15 @@ try:
         if up_p is None or up_m is None:
             st.info("Upload both CSV files, or uncheck the option above.")
             st.stop()
-        profiles = pd.read_csv(up_p)
+        profiles = read_uploaded_csv(up_p.getvalue())
     else:
-        profiles = pd.read_csv("synthetic_profiles_v2.csv")
+        profiles = load_profiles("synthetic_profiles_v2.csv")
 except Exception as e:
     st.error(f"Error loading data: {e}")
     st.stop()
 
+profiles_by_label = index_by_label(profiles)
+
 
 # ============================================================
 # TABS
@@ -588,16 +725,16 @@ with tab1:
     tenant_list = sorted(profiles["tenant_label"].unique().tolist())
     selected_tenant = st.selectbox("Select a tenant", tenant_list, index=0, label_visibility="collapsed")
 
-    sel_row = profiles[profiles["tenant_label"] == selected_tenant].head(1)
-    if sel_row.empty:
+    if selected_tenant not in profiles_by_label.index:
         st.error("Tenant not found.")
         st.stop()
+    sel_row = profiles_by_label.loc[[selected_tenant]]
 
     # Profile card
     st.markdown('<div class="profile-box">', unsafe_allow_html=True)
     c_av, c_bars = st.columns([1, 5], gap="large")
     with c_av:
-        st.image(avatar_url(selected_tenant, 120), width=104)
+        st.image(avatar_image(selected_tenant, 2*104), width=104)
         st.markdown(
             f"<div style='text-align:center;font-weight:700;font-size:0.9rem;"
             f"margin-top:0.5rem;color:#0f3460;'>{selected_tenant}</div>",
@@ -609,7 +746,7 @@ with tab1:
     st.markdown('</div>', unsafe_allow_html=True)
 
     # Compute live matches
-    live = match_from_profile(sel_row.iloc[0], profiles, top_n=top_n)
+    live = matches_for(selected_tenant, profiles)[:top_n]
 
     st.markdown('<div class="section-title">Top Matches</div>', unsafe_allow_html=True)
     st.markdown(
@@ -620,7 +757,7 @@ with tab1:
     # ── Radar expander ─────────────────────────────────────────
     if live:
         best = live[0]
-        best_row = profiles[profiles["tenant_label"] == best["label"]].iloc[0]
+        best_row = profiles_by_label.loc[best["label"]]
         va_list = [int(sel_row[f].values[0]) for f in FEATURES]
         vb_list = [int(best_row[f]) for f in FEATURES]
         short_lbls = [FEATURE_LABELS[f][0].split(" ", 1)[1] for f in FEATURES]
@@ -657,20 +794,22 @@ with tab1:
             )
 
     # ── Match cards ────────────────────────────────────────────
-    for rank, m in enumerate(live, start=1):
+    start, stop = card_page(len(live), key="page_tab1")
+    avatars = prefetch_avatars(tuple(m["label"] for m in live[start:stop]), 2*72)
+    for rank, m in enumerate(live[start:stop], start=start+1):
         label = m["label"]
         score = m["score"]
         driver_tags = "".join([
-            f'<span class="driver-tag">{prettify(f)}</span>'
+            f'<span class="driver-tag">{PRETTY[f]}</span>'
             for f, sc, w, mode in m["top3"]
         ])
-        driver_text = ", ".join([prettify(f) for f, sc, w, mode in m["top3"]])
-        match_row = profiles[profiles["tenant_label"] == label].iloc[0]
+        driver_text = ", ".join([PRETTY[f] for f, sc, w, mode in m["top3"]])
+        match_row = profiles_by_label.loc[label]
 
         st.markdown('<div class="match-card">', unsafe_allow_html=True)
         c1, c2, c3 = st.columns([1, 5, 2], gap="medium")
         with c1:
-            st.image(avatar_url(label, 96), width=72)
+            st.image(avatars[label] or avatar_url(label, 2*72), width=72)
         with c2:
             st.markdown(
                 f'<div class="match-name"><span class="rank-pill">{rank}</span>{label}</div>'
@@ -737,7 +876,7 @@ with tab2:
     # ── Radar expander ─────────────────────────────────────────
     if live2:
         best2 = live2[0]
-        best2_row = profiles[profiles["tenant_label"] == best2["label"]].iloc[0]
+        best2_row = profiles_by_label.loc[best2["label"]]
         vu_list   = [user_vals[f] for f in FEATURES]
         vb2_list  = [int(best2_row[f]) for f in FEATURES]
         short_lbls2 = [FEATURE_LABELS[f][0].split(" ", 1)[1] for f in FEATURES]
@@ -774,20 +913,22 @@ with tab2:
             )
 
     # ── Match cards ────────────────────────────────────────────
-    for rank, m in enumerate(live2, start=1):
+    start2, stop2 = card_page(len(live2), key="page_tab2")
+    avatars2 = prefetch_avatars(tuple(m["label"] for m in live2[start2:stop2]), 2*72)
+    for rank, m in enumerate(live2[start2:stop2], start=start2+1):
         label = m["label"]
         score = m["score"]
         driver_tags = "".join([
-            f'<span class="driver-tag">{prettify(f)}</span>'
+            f'<span class="driver-tag">{PRETTY[f]}</span>'
             for f, sc, w, mode in m["top3"]
         ])
-        driver_text = ", ".join([prettify(f) for f, sc, w, mode in m["top3"]])
-        match_row = profiles[profiles["tenant_label"] == label].iloc[0]
+        driver_text = ", ".join([PRETTY[f] for f, sc, w, mode in m["top3"]])
+        match_row = profiles_by_label.loc[label]
 
         st.markdown('<div class="match-card">', unsafe_allow_html=True)
         c1, c2, c3 = st.columns([1, 5, 2], gap="medium")
         with c1:
-            st.image(avatar_url(label, 96), width=72)
+            st.image(avatars2[label] or avatar_url(label, 2*72), width=72)
         with c2:
             st.markdown(
                 f'<div class="match-name"><span class="rank-pill">{rank}</span>{label}</div>'
@@ -1,12 +1,17 @@
 # matching_prototype_v2.py
 # Tenant matching prototype (similarity + complementarity) with explainability
-# Requirements: Python 3.8+, numpy, pandas
+# Requirements: Python 3.8+, numpy, pandas (optional: numba, for a faster scoring kernel)
 # Run: python3 matching_prototype_v2.py
 
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Tuple
 
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; compatibility_matrix falls back to NumPy
+    njit = None
+
 
 # =========================
 # CONFIG
@@ -87,7 +92,8 @@ def generate_synthetic_profiles(n: int, seed: int = None) -> pd.DataFrame:
 
     data = {"user_id": np.arange(1, n + 1)}
     for f in FEATURES:
-        data[f] = np.random.randint(SCALE_MIN, SCALE_MAX + 1, size=n)
+        # draw as default int (keeps the seeded sequence), store as int8: values are 1..5
+        data[f] = np.random.randint(SCALE_MIN, SCALE_MAX + 1, size=n).astype(np.int8)
 
     df = pd.DataFrame(data)
     df["tenant_label"] = df["user_id"].apply(make_tenant_label)
@@ -145,6 +151,100 @@ def feature_score(feature: str, a: float, b: float) -> Tuple[float, str]:
     return similarity_score(a, b), "similarity"
 
 
+def feature_scores(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Per-feature scores in [0..1] for aligned (broadcastable) value arrays whose
+    last axis follows FEATURES. Same formulas as similarity_score /
+    complementarity_score, evaluated element-wise with NumPy.
+    """
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+
+    max_dist = float(SCALE_MAX - SCALE_MIN)
+    if max_dist <= 0:
+        return np.ones(np.broadcast_shapes(a.shape, b.shape))
+    target_sum = float(SCALE_MIN + SCALE_MAX)
+
+    sim = 1.0 - (np.abs(a - b) / max_dist)
+    comp = 1.0 - (np.abs((a + b) - target_sum) / max_dist)
+    is_comp = np.array([SCORING_MODE.get(f, "similarity") == "complementarity" for f in FEATURES])
+    return np.clip(np.where(is_comp, comp, sim), 0.0, 1.0)
+
+
+if njit is not None:
+    @njit(cache=True, parallel=True)
+    def _score_all(values, w, is_comp, total_weight, target_sum, max_dist):
+        n, n_features = values.shape
+        out = np.empty((n, n))
+        for i in prange(n):
+            out[i, i] = -np.inf
+            for j in range(i + 1, n):  # scores are symmetric: fill (i, j) and (j, i) together
+                weighted_sum = 0.0
+                for k in range(n_features):
+                    a = values[i, k]
+                    b = values[j, k]
+                    if is_comp[k]:
+                        sc = 1.0 - (abs((a + b) - target_sum) / max_dist)
+                    else:
+                        sc = 1.0 - (abs(a - b) / max_dist)
+                    weighted_sum += w[k] * min(1.0, max(0.0, sc))
+                out[i, j] = out[j, i] = (weighted_sum / total_weight) * 100.0
+        return out
+else:
+    _score_all = None
+
+
+def compatibility_matrix(values: np.ndarray) -> np.ndarray:
+    """
+    Compatibility (0..100) for every pair of profiles, shape (n, n).
+    The diagonal is -inf so a tenant is never matched with themselves.
+    Both scoring modes are symmetric, so only pairs i < j are scored and
+    then mirrored.
+    Uses the Numba kernel when numba is installed, NumPy broadcasting otherwise;
+    both accumulate features in FEATURES order, like the scalar version, so
+    scores (and therefore ties) are bit-identical.
+    """
+    w = np.array([float(WEIGHTS.get(f, 1.0)) for f in FEATURES])
+    total_weight = sum(WEIGHTS.get(f, 1.0) for f in FEATURES)
+    max_dist = float(SCALE_MAX - SCALE_MIN)
+
+    if _score_all is not None and max_dist > 0:
+        is_comp = np.array([SCORING_MODE.get(f, "similarity") == "complementarity" for f in FEATURES])
+        return _score_all(np.ascontiguousarray(values, dtype=float), w, is_comp,
+                          total_weight, float(SCALE_MIN + SCALE_MAX), max_dist)
+
+    n = len(values)
+    iu, ju = np.triu_indices(n, k=1)
+    scores = feature_scores(values[iu], values[ju])  # (n*(n-1)/2, n_features), 0..1
+    weighted_sum = np.zeros(len(iu))
+    for k in range(len(FEATURES)):
+        weighted_sum += w[k] * scores[:, k]
+
+    compat = np.empty((n, n))
+    compat[iu, ju] = compat[ju, iu] = (weighted_sum / total_weight) * 100.0
+    np.fill_diagonal(compat, -np.inf)
+    return compat
+
+
+def top_n_indices(scores: np.ndarray, top_n: int) -> np.ndarray:
+    """
+    Column indices of the top_n highest scores in each row, best first.
+    Partitions each row (O(n)) instead of fully sorting it; only the few
+    candidates at or above the top_n-th score get sorted. Equal scores keep
+    profile order, same as a stable descending sort.
+    """
+    n_rows = scores.shape[0]
+    if top_n <= 0:
+        return np.empty((n_rows, 0), dtype=int)
+
+    kth = -np.partition(-scores, top_n - 1, axis=1)[:, top_n - 1]  # top_n-th best score per row
+    out = np.empty((n_rows, top_n), dtype=int)
+    for i in range(n_rows):
+        cand = np.flatnonzero(scores[i] >= kth[i])  # ascending index; more than top_n only on ties
+        out[i] = cand[np.argsort(-scores[i, cand], kind="stable")[:top_n]]
+    return out
+
+
 # =========================
 # MATCHING + EXPLAINABILITY
 # =========================
@@ -152,6 +252,9 @@ def prettify_feature_name(f: str) -> str:
     return f.replace("_", " ").capitalize()
 
 
+PRETTY_FEATURE_NAMES: Dict[str, str] = {f: prettify_feature_name(f) for f in FEATURES}
+
+
 def compute_top_matches(profiles: pd.DataFrame, top_n: int = 5) -> pd.DataFrame:
     """
     Computes top_n matches for each tenant.
@@ -161,69 +264,58 @@ def compute_top_matches(profiles: pd.DataFrame, top_n: int = 5) -> pd.DataFrame:
       - short + long explanation
     """
     features = FEATURES
-    weights = WEIGHTS
-    total_weight = sum(weights.get(f, 1.0) for f in features)
+    modes = [SCORING_MODE.get(f, "similarity") for f in features]
+    w = np.array([float(WEIGHTS.get(f, 1.0)) for f in features])
 
-    records = profiles.to_dict(orient="records")
+    # plain arrays indexed by row position (no per-row dicts / Series lookups)
+    ids = profiles["user_id"].to_numpy()
+    labels = profiles["tenant_label"].to_numpy()
+    values = profiles[features].to_numpy()
     out_rows: List[Dict] = []
 
-    for i, a in enumerate(records):
-        candidates: List[Tuple[int, float, List[Tuple[str, float, float, str]]]] = []
+    n = len(profiles)
+    top_n = min(top_n, n - 1)
 
-        for j, b in enumerate(records):
-            if a["user_id"] == b["user_id"]:
-                continue
+    compat = compatibility_matrix(values)
+    top_idx = top_n_indices(compat, top_n)  # (n, top_n)
 
-            per_feature_details: List[Tuple[str, float, float, str]] = []
-            weighted_sum = 0.0
+    # per-feature scores/contributions for the retained pairs only: (n, top_n, n_features)
+    top_scores = feature_scores(values[:, None, :], values[top_idx])
+    contrib = top_scores * w
+    # drivers = top 3 features by contribution; stable so equal contributions keep FEATURES order
+    top3_idx = np.argsort(-contrib, axis=-1, kind="stable")[..., :3]
 
-            for f in features:
-                av = float(a[f])
-                bv = float(b[f])
-                sc, mode = feature_score(f, av, bv)  # 0..1
-                w = float(weights.get(f, 1.0))
-                weighted_sum += w * sc
-                per_feature_details.append((f, sc, w, mode))
+    for i in range(n):
+        for r in range(top_n):
+            j_idx = top_idx[i, r]
+            compat_score = compat[i, j_idx]
 
-            compat = (weighted_sum / total_weight) * 100.0
-
-            # drivers: sort by contribution = w*score
-            per_feature_details.sort(key=lambda x: x[1] * x[2], reverse=True)
-            candidates.append((j, compat, per_feature_details))
-
-        candidates.sort(key=lambda x: x[1], reverse=True)
-        top = candidates[:top_n]
-
-        for rank, (j_idx, compat_score, details) in enumerate(top, start=1):
-            b = records[j_idx]
-
-            # top 3 drivers
-            top3 = details[:3]
+            # one pass over the top 3 drivers builds all three driver texts
             driver_parts = []
             driver_pretty = []
-            for f, sc, w, mode in top3:
-                driver_parts.append(f"{f}(mode={mode}, score={sc:.2f}, w={w:.2f})")
-                driver_pretty.append(prettify_feature_name(f))
-
-            explanation_short = f"High compatibility driven by {', '.join(driver_pretty)}."
+            values_hint = []
+            for k in top3_idx[i, r]:
+                f, sc, mode = features[k], top_scores[i, r, k], modes[k]
+                driver_parts.append(f"{f}(mode={mode}, score={sc:.2f}, w={w[k]:.2f})")
+                driver_pretty.append(PRETTY_FEATURE_NAMES[f])
+                values_hint.append(f"{f}: {values[i, k]} vs {values[j_idx, k]} ({mode}, {sc:.2f})")
+
+            drivers_txt = ", ".join(driver_pretty)
+            explanation_short = f"High compatibility driven by {drivers_txt}."
             explanation_long = (
-                f"{a['tenant_label']} matches well with {b['tenant_label']} "
-                f"(score {compat_score:.2f}%). Top drivers: {', '.join(driver_pretty)}. "
+                f"{labels[i]} matches well with {labels[j_idx]} "
+                f"(score {compat_score:.2f}%). Top drivers: {drivers_txt}. "
                 "Note: similarity rewards close values, while complementarity rewards balanced pairs "
                 "(on a 1..5 scale, best when a+b is about 6)."
             )
-            # extra: show values for top drivers for clarity
-            values_hint = []
-            for f, sc, w, mode in top3:
-                values_hint.append(f"{f}: {a[f]} vs {b[f]} ({mode}, {sc:.2f})")
             values_hint_txt = " | ".join(values_hint)
 
             out_rows.append({
-                "user_id": a["user_id"],
-                "tenant_label": a["tenant_label"],
-                "match_rank": rank,
-                "match_user_id": b["user_id"],
-                "match_tenant_label": b["tenant_label"],
+                "user_id": ids[i],
+                "tenant_label": labels[i],
+                "match_rank": r + 1,
+                "match_user_id": ids[j_idx],
+                "match_tenant_label": labels[j_idx],
                 "compatibility_score": round(float(compat_score), 2),
                 "top_drivers": "; ".join(driver_parts),
                 "explanation_short": explanation_short,